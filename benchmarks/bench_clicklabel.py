@@ -0,0 +1,381 @@
+"""Offline benchmark suite for ClickLabel.
+
+Generates synthetic videos with cv2.VideoWriter, drives the frame navigation,
+render and annotation code of clicklabel_engine.AnnotationEngine (which the Tk
+window is a thin client of) without a display and writes the timings to a
+JSON report. The report can be stored as a baseline and later runs compared
+against it:
+
+    python benchmarks/bench_clicklabel.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_clicklabel.py --baseline benchmarks/baseline.json
+
+cv2.VideoWriter has no working GOP setting, so variants with other keyframe
+intervals are re-encoded with the ffmpeg command line tool if it is available.
+The keyframe interval of every video is measured, and GOP variants whose
+interval doesn't match are skipped rather than reported.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import statistics
+import tkinter as tk
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from clicklabel_engine import AnnotationEngine, AnnotationStore  # noqa: E402
+from clicklabel import LABEL_COLORS, AnnotationOverlay, overlay_specs  # noqa: E402
+
+RESOLUTIONS = {"480p": (854, 480), "720p": (1280, 720), "1080p": (1920, 1080)}
+CODECS = {"mp4v": ".mp4", "MJPG": ".avi", "XVID": ".avi"}
+GOP_SIZES = [1, 12, 60]  # Keyframe intervals of the ffmpeg re-encoded variants
+NAV_PATTERNS = ["step1", "step10", "step60", "reverse1", "random"]
+ANNOTATION_COUNTS = [10_000, 100_000, 1_000_000]
+OVERLAY_POINTS = [1_000, 5_000]  # Points per frame on the dense overlay frames
+OVERLAY_TAIL = 10  # Tail length in frame steps for the overlay benchmark
+ANNOTATION_REPEATS = 5  # Timed repetitions of each annotation insert/export
+DISPLAY_WIDTH = 1280  # Simulated window width used for rendering
+
+
+def make_video(path, codec, size, n_frames, fps=30):
+    """Write a synthetic video; returns False if the codec is unavailable."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, size)
+    if not writer.isOpened():
+        return False
+
+    width, height = size
+    yy, xx = np.indices((height, width))
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 32, (height, width, 3), dtype=np.uint8)
+    for i in range(n_frames):
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[..., 0] = (xx + 4 * i) % 256
+        frame[..., 1] = (yy + 2 * i) % 256
+        frame[..., 2] = (xx + yy + i) % 256
+        frame += noise
+        cv2.putText(frame, str(i), (40, 80), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        writer.write(frame)
+    writer.release()
+    return True
+
+
+def reencode_gop(ffmpeg, src, dst, gop):
+    """Re-encode src as MPEG-4 Part 2 (same as mp4v) with a fixed keyframe interval."""
+    cmd = [ffmpeg, "-y", "-v", "error", "-i", src, "-c:v", "mpeg4", "-q:v", "4",
+           "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0", "-bf", "0", dst]
+    return subprocess.run(cmd, capture_output=True).returncode == 0
+
+
+def keyframe_interval(path):
+    """Largest distance between keyframes, or None if this OpenCV build can't tell."""
+    if not hasattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME"):
+        return None
+    # Raw mode returns the encoded packets, which carry the keyframe flag
+    cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+    if not cap.isOpened():
+        return None
+    keyframes = []
+    n = 0
+    while cap.grab():
+        if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+            keyframes.append(n)
+        n += 1
+    cap.release()
+    if not keyframes:
+        return None
+    return max(b - a for a, b in zip(keyframes, keyframes[1:] + [n]))
+
+
+def summarize(samples):
+    samples_ms = sorted(s * 1000 for s in samples)
+    return {
+        "n": len(samples_ms),
+        "mean_ms": statistics.fmean(samples_ms),
+        "median_ms": statistics.median(samples_ms),
+        "p95_ms": samples_ms[int(0.95 * (len(samples_ms) - 1))],
+    }
+
+
+def bench_navigation(video_path, n_frames, pattern, n_ops, seed=0):
+    engine = AnnotationEngine(video_path)
+    samples = []
+    if pattern == "reverse1":
+        engine.seek(n_frames - 1)
+        for _ in range(min(n_ops, n_frames - 1)):
+            started = time.perf_counter()
+            engine.step(-1)
+            samples.append(time.perf_counter() - started)
+    elif pattern == "random":
+        rng = random.Random(seed)
+        for _ in range(n_ops):
+            target = rng.randrange(n_frames)
+            started = time.perf_counter()
+            engine.seek(target)
+            samples.append(time.perf_counter() - started)
+    else:
+        engine.frame_step = int(pattern[len("step"):])
+        for _ in range(n_ops):
+            if engine.frame_idx + engine.frame_step >= n_frames:
+                engine.seek(0)
+            started = time.perf_counter()
+            engine.step()
+            samples.append(time.perf_counter() - started)
+    engine.close()
+    return summarize(samples)
+
+
+def bench_render(video_path, n_ops):
+    engine = AnnotationEngine(video_path)
+    samples = []
+    for _ in range(n_ops):
+        started = time.perf_counter()
+        engine.render(DISPLAY_WIDTH)
+        samples.append(time.perf_counter() - started)
+    engine.close()
+    return summarize(samples)
+
+
+def bench_annotations(video_path, n_points, repeats, seed=0):
+    """Time inserting n_points clicks into an empty store and exporting them, repeats times each."""
+    engine = AnnotationEngine(video_path)
+    engine.render(DISPLAY_WIDTH)  # Sets the display transform used to map clicks
+    rng = random.Random(seed)
+    clicks = [(rng.randrange(DISPLAY_WIDTH), rng.randrange(720)) for _ in range(n_points)]
+
+    insert_samples = []
+    for _ in range(repeats):
+        engine.store = AnnotationStore()
+        started = time.perf_counter()
+        for i, (x, y) in enumerate(clicks):
+            x_orig, y_orig = engine.transform.to_original(x, y)
+            engine.add_point(x_orig, y_orig, "bench", frame_idx=i)
+        insert_samples.append(time.perf_counter() - started)
+
+    export_samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(repeats):
+            output_dir = os.path.join(tmp, str(i))  # Exports are named by the second, keep them apart
+            started = time.perf_counter()
+            engine.export(output_dir)
+            export_samples.append(time.perf_counter() - started)
+    engine.close()
+
+    insert = summarize(insert_samples)
+    insert["per_point_us"] = insert["median_ms"] * 1000 / n_points
+    return insert, summarize(export_samples)
+
+
+def warm_up_export(workdir):
+    """Export once untimed, so the lazy pandas import isn't counted in the export timings."""
+    store = AnnotationStore()
+    store.add("warmup", 0, 0, 0, "warmup")
+    store.export_csv(os.path.join(workdir, "warmup.csv"))
+
+
+def dense_overlay_engine(video_path, points_per_frame, seed=0):
+    """Engine on a frame with points_per_frame points on it and on each tail frame."""
+    engine = AnnotationEngine(video_path)
+    engine.render(DISPLAY_WIDTH)
+    rng = random.Random(seed)
+    width, height = int(engine.source.width), int(engine.source.height)
+    for frame in range(OVERLAY_TAIL + 2):
+        for i in range(points_per_frame):
+            engine.add_point(rng.randrange(width), rng.randrange(height), ("Male", "Female")[i % 2], frame_idx=frame)
+    engine.seek(OVERLAY_TAIL)
+    return engine
+
+
+def label_colors():
+    colors = {}
+    return lambda label: colors.setdefault(label, LABEL_COLORS[len(colors) % len(LABEL_COLORS)])
+
+
+def bench_overlay(video_path, points_per_frame, n_ops):
+    """Time the per-frame lookup and the overlay item specs for a dense frame."""
+    engine = dense_overlay_engine(video_path, points_per_frame)
+    color_for = label_colors()
+    near, specs = [], []
+    for _ in range(n_ops):
+        started = time.perf_counter()
+        engine.annotations_near(OVERLAY_TAIL)
+        near.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        overlay_specs(engine, OVERLAY_TAIL, color_for)
+        specs.append(time.perf_counter() - started)
+    engine.close()
+    return summarize(near), summarize(specs)
+
+
+def bench_overlay_draw(video_path, points_per_frame, n_ops):
+    """Time full overlay redraws on a Tk canvas, alternating between two dense frames.
+
+    Returns None when no display is available.
+    """
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return None
+    canvas = tk.Canvas(root, width=DISPLAY_WIDTH, height=DISPLAY_WIDTH)
+    canvas.pack()
+    overlay = AnnotationOverlay(canvas, OVERLAY_TAIL)
+    engine = dense_overlay_engine(video_path, points_per_frame)
+
+    started = time.perf_counter()
+    overlay.redraw(engine)
+    root.update_idletasks()
+    first = time.perf_counter() - started
+
+    samples = []
+    for i in range(n_ops):
+        engine.seek(OVERLAY_TAIL + 1 - i % 2)
+        started = time.perf_counter()
+        overlay.redraw(engine)
+        root.update_idletasks()
+        samples.append(time.perf_counter() - started)
+    engine.close()
+    root.destroy()
+    return dict(summarize(samples), first_draw_ms=first * 1000)
+
+
+def run_variant(results, name, path, n_frames, n_ops):
+    for pattern in NAV_PATTERNS:
+        results[f"nav/{name}/{pattern}"] = bench_navigation(path, n_frames, pattern, n_ops)
+    results[f"render/{name}"] = bench_render(path, n_ops)
+
+
+def run_suite(workdir, quick=False, ffmpeg=None):
+    n_frames = 120 if quick else 600
+    n_ops = 20 if quick else 100
+    resolutions = ["480p"] if quick else list(RESOLUTIONS)
+    gops = GOP_SIZES[:2] if quick else GOP_SIZES
+    counts = ANNOTATION_COUNTS[:1] if quick else ANNOTATION_COUNTS
+
+    results = {}
+    skipped = {}  # variant -> reason
+    keyframe_intervals = {}
+    render_video = None
+    for res in resolutions:
+        for codec, ext in CODECS.items():
+            name = f"{res}-{codec}"
+            path = os.path.join(workdir, name + ext)
+            if not make_video(path, codec, RESOLUTIONS[res], n_frames):
+                skipped[name] = "codec not available"
+                continue
+            keyframe_intervals[name] = keyframe_interval(path)
+            render_video = render_video or path
+            run_variant(results, name, path, n_frames, n_ops)
+
+        source = os.path.join(workdir, f"{res}-mp4v.mp4")
+        for gop in gops:
+            name = f"{res}-mp4v-g{gop}"
+            path = os.path.join(workdir, name + ".mp4")
+            if ffmpeg is None:
+                skipped[name] = "ffmpeg not found"
+                continue
+            if not os.path.exists(source) or not reencode_gop(ffmpeg, source, path, gop):
+                skipped[name] = "re-encoding failed"
+                continue
+            interval = keyframe_interval(path)
+            if interval != gop:
+                skipped[name] = f"keyframe interval is {interval}, not {gop}"
+                continue
+            keyframe_intervals[name] = interval
+            run_variant(results, name, path, n_frames, n_ops)
+
+    if render_video is not None:
+        warm_up_export(workdir)
+        repeats = 3 if quick else ANNOTATION_REPEATS
+        for n_points in counts:
+            results[f"annotations/{n_points}/insert"], results[f"annotations/{n_points}/export"] = \
+                bench_annotations(render_video, n_points, repeats)
+        for n_points in OVERLAY_POINTS:
+            name = f"overlay/{n_points}pts"
+            results[f"{name}/near"], results[f"{name}/specs"] = bench_overlay(render_video, n_points, n_ops)
+            draw = bench_overlay_draw(render_video, n_points, n_ops)
+            if draw is None:
+                skipped[f"{name}/draw"] = "no display"
+            else:
+                results[f"{name}/draw"] = draw
+    return results, skipped, keyframe_intervals
+
+
+def compare(results, baseline, threshold):
+    """Compare the median of every result with the baseline.
+
+    Returns (regressions, missing): regressions are (name, old, new) medians
+    more than threshold slower, missing are baseline keys without a result.
+    """
+    regressions = []
+    for name, entry in results.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]["median_ms"], entry["median_ms"]
+        if old > 0 and new > old * (1 + threshold):
+            regressions.append((name, old, new))
+    missing = [name for name in baseline if name not in results]
+    return regressions, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ClickLabel benchmark suite")
+    parser.add_argument("-o", "--output", default="bench_report.json", help="Path of the JSON report")
+    parser.add_argument("--baseline", help="Compare against this baseline report")
+    parser.add_argument("--save-baseline", help="Also store the report as a baseline at this path")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed relative slowdown before a result counts as a regression")
+    parser.add_argument("--quick", action="store_true", help="Small run for smoke testing")
+    parser.add_argument("--ffmpeg", default=shutil.which("ffmpeg"),
+                        help="ffmpeg executable used to encode the GOP variants (default: from PATH)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results, skipped, keyframe_intervals = run_suite(workdir, quick=args.quick, ffmpeg=args.ffmpeg)
+    for name, reason in skipped.items():
+        print(f"Skipped {name}: {reason}")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "platform": platform.platform(),
+            "quick": args.quick,
+            "skipped": skipped,
+            "keyframe_intervals": keyframe_intervals,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Wrote benchmark report to {}".format(args.output))
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print("Saved baseline to {}".format(args.save_baseline))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("quick") != args.quick:
+            print("Baseline {} was recorded {} --quick; rerun with matching options to compare".format(
+                args.baseline, "with" if baseline["meta"].get("quick") else "without"))
+            sys.exit(2)
+        regressions, missing = compare(results, baseline["results"], args.threshold)
+        for name in missing:
+            print(f"MISSING {name}: in the baseline but not in this run")
+        for name, old, new in regressions:
+            print(f"REGRESSION {name}: {old:.2f} -> {new:.2f} ms")
+        if regressions:
+            sys.exit(1)
+        print("No regressions above {:.0%}".format(args.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,167 @@
-import os
-import cv2
 import time
+_START_TIME = time.perf_counter()  # Process start, used to report time to first paint
+
+import os
+import sys
+import queue
+import threading
 import tkinter as tk
 from tkinter import filedialog, simpledialog, ttk
 from PIL import Image, ImageTk
-import pandas as pd
 import argparse
+from clicklabel_engine import AnnotationEngine, FrameSource
+from clicklabel_stream import EventStreamer, POLICIES, parse_target
+
+LOADER_POLL_MS = 15  # How often the UI checks whether the background video loader has finished
+LABEL_COLORS = ["#ff0000", "#00c0ff", "#ffd000", "#40ff40", "#ff40ff", "#ff8000"]  # Overlay color per label
+FADE_COLOR = (128, 128, 128)  # Tail points fade towards this color with age
+
+
+def fade(color, amount):
+    """Blend a #rrggbb color towards FADE_COLOR; amount 0 keeps it, 1 is fully faded."""
+    rgb = [int(color[i:i + 2], 16) for i in (1, 3, 5)]
+    return "#" + "".join(f"{int(c + (f - c) * amount):02x}" for c, f in zip(rgb, FADE_COLOR))
+
+
+class CanvasItemPool:
+    """Canvas items of one kind that are reused between redraws instead of recreated.
+
+    Items are only reconfigured when their coordinates or options change, and
+    surplus items are hidden, so a redraw costs a few Tk calls per changed item.
+    """
+
+    def __init__(self, canvas, kind, tag):
+        self.canvas = canvas
+        self.create = getattr(canvas, "create_" + kind)
+        self.tag = tag
+        self.items = []  # [item id, coords, options] as last applied
+        self.used = 0
+
+    def reset(self):
+        """Forget all items, e.g. after canvas.delete("all")."""
+        self.items = []
+        self.used = 0
+
+    def draw(self, specs):
+        """Show one item per (coords, options) pair in specs and hide the rest."""
+        for i, (coords, options) in enumerate(specs):
+            if i < len(self.items):
+                item = self.items[i]
+                if item[1] != coords:
+                    self.canvas.coords(item[0], *coords)
+                    item[1] = coords
+                if item[2] != options:
+                    self.canvas.itemconfigure(item[0], state="normal", **options)
+                    item[2] = options
+            else:
+                item_id = self.create(*coords, tags=self.tag, **options)
+                self.items.append([item_id, coords, options])
+        for item in self.items[len(specs):self.used]:
+            self.canvas.itemconfigure(item[0], state="hidden")
+            item[2] = None
+        self.used = len(specs)
+
+
+def overlay_specs(engine, tail_length, color_for):
+    """Canvas item specs (coords, options) for the tail lines, tail dots and current points.
+
+    A label's tail is only joined by lines when it has a single point on each
+    frame; with several points per frame the pairing is ambiguous, so only
+    dots are drawn.
+    """
+    current, tails = engine.annotations_near(tail_length)
+    to_display = engine.transform.to_display
+
+    point_specs = []
+    point_options = {}  # Options are shared between items of the same label (and age)
+    heads = {}  # label -> display positions of its points on the current frame
+    for _, (_, _, x, y, label) in current:
+        dx, dy = to_display(x, y)
+        heads.setdefault(label, []).append((dx, dy))
+        options = point_options.get(label)
+        if options is None:
+            options = point_options[label] = {"outline": color_for(label), "width": 2}
+        point_specs.append(((dx - 5, dy - 5, dx + 5, dy + 5), options))
+
+    line_specs, dot_specs = [], []
+    for label, points in tails.items():
+        color = color_for(label)
+        ages = [age for age, _, _ in points]
+        join = len(set(ages)) == len(ages) and len(heads.get(label, ())) <= 1
+        dot_options = {}
+        previous = None
+        for age, x, y in points:
+            dx, dy = to_display(x, y)
+            options = dot_options.get(age)
+            if options is None:
+                faded = fade(color, age / (tail_length + 1))
+                options = dot_options[age] = {"outline": faded, "fill": faded}
+            dot_specs.append(((dx - 3, dy - 3, dx + 3, dy + 3), options))
+            if join and previous is not None:
+                line_specs.append((previous + (dx, dy), {"fill": options["fill"], "width": 2}))
+            previous = (dx, dy)
+        if join and label in heads:
+            line_specs.append((previous + heads[label][0], {"fill": fade(color, 0.5 / (tail_length + 1)), "width": 2}))
+    return line_specs, dot_specs, point_specs
+
+
+class AnnotationOverlay:
+    """Draws the points of the current frame and fading per-label tails over the video."""
+
+    def __init__(self, canvas, tail_length=0):
+        self.canvas = canvas
+        self.tail_length = tail_length
+        self.tail_lines = CanvasItemPool(canvas, "line", "overlay_tail")
+        self.tail_dots = CanvasItemPool(canvas, "oval", "overlay_tail")
+        self.points = CanvasItemPool(canvas, "oval", "overlay_point")
+        self.label_colors = {}
+
+    def reset(self):
+        for pool in (self.tail_lines, self.tail_dots, self.points):
+            pool.reset()
+
+    def color_for(self, label):
+        if label not in self.label_colors:
+            self.label_colors[label] = LABEL_COLORS[len(self.label_colors) % len(LABEL_COLORS)]
+        return self.label_colors[label]
+
+    def redraw(self, engine):
+        line_specs, dot_specs, point_specs = overlay_specs(engine, self.tail_length, self.color_for)
+        self.tail_lines.draw(line_specs)
+        self.tail_dots.draw(dot_specs)
+        self.points.draw(point_specs)
+        self.canvas.tag_raise("overlay_tail")
+        self.canvas.tag_raise("overlay_point")
+
 
 class VideoAnnotator:
-    def __init__(self, root, video_path):
+    def __init__(self, root, video_path, streamer=None):
         self.root = root
         self.root.title("Video Annotator")
         self.root.attributes('-fullscreen', True)
 
-        # Video variables
-        self.video_path = video_path
-        self.cap = cv2.VideoCapture(self.video_path) if self.video_path else None
+        # Video, navigation and annotation state lives in the engine
+        self.engine = AnnotationEngine()
+        self.streamer = streamer  # Optional live output of annotation events
+        if self.streamer:
+            self.engine.store.listeners.append(self.streamer.on_annotation)
         self.playing = False
-        self.frame = None
-        self.scale_factor_x = 1
-        self.scale_factor_y = 1
-        self.frame_step = 1
-        self.clicks = []
-        self.frame_idx = 0
         self.max_annotations = 1  # Max number of annotations per frame
         self.current_annotations = 0  # Number of annotations made so far for the current frame
 
+        # Background loader state
+        self.loader_queue = queue.Queue()
+        self.loader_token = 0  # Incremented per load so results of superseded loads are discarded
+        self.loading = False
+        self.loading_path = None
+
         # UI Elements
         self.canvas = tk.Canvas(root)
         self.canvas.pack(fill=tk.BOTH, expand=True)
         self.canvas.bind("<Button-1>", self.on_left_click)
         self.canvas.bind("<Button-3>", self.on_right_click)
+        self.image_item = None  # Canvas item showing the video frame, reused between frames
+        self.overlay = AnnotationOverlay(self.canvas)
         self.root.bind("<Escape>", self.close_app)
 
         controls_frame = tk.Frame(root)
@@ -63,6 +194,11 @@ class VideoAnnotator:
         self.frame_rate_slider.set(1)
         self.frame_rate_slider.pack(side=tk.LEFT, padx=5, pady=5)
 
+        self.tail_slider = tk.Scale(controls_frame, from_=0, to=30, orient="horizontal",
+                                    label="Tail Length", command=lambda val: self.set_tail_length(int(val)))
+        self.tail_slider.set(0)
+        self.tail_slider.pack(side=tk.LEFT, padx=5, pady=5)
+
         self.quit_btn = tk.Button(controls_frame, text="Quit", command=self.close_app)
         self.quit_btn.pack(side=tk.LEFT, padx=5, pady=5)
 
@@ -98,11 +234,16 @@ class VideoAnnotator:
         self.table.tag_configure('odd', background='white')
         self.table.tag_configure('even', background='#ededed')
 
-        if self.cap and self.cap.isOpened():
-            self.load_first_frame()
+        self.root.after_idle(self.report_first_paint)
+        if video_path:
+            self.open_video_async(video_path)
 
         self.root.after(30, self.update_loop)
 
+    def report_first_paint(self):
+        elapsed_ms = (time.perf_counter() - _START_TIME) * 1000
+        print(f"First paint after {elapsed_ms:.0f} ms")
+
     def set_label(self, label):
         """Set label to a given value"""
         self.label_entry.delete(0,15)
@@ -117,77 +258,147 @@ class VideoAnnotator:
 
     def close_app(self, event=None):
         self.save_clicks()
-        if self.cap:
-            self.cap.release()
+        self.engine.close()
+        if self.streamer:
+            self.streamer.close()
         self.root.destroy()
 
     def load_video(self):
-        self.video_path = filedialog.askopenfilename(filetypes=[("Video files", "*.mp4 *.avi *.MP4")])
-        if self.video_path:
-            self.cap = cv2.VideoCapture(self.video_path)
-            if self.cap.isOpened():
-                self.load_first_frame()
+        video_path = filedialog.askopenfilename(filetypes=[("Video files", "*.mp4 *.avi *.MP4")])
+        if video_path:
+            self.open_video_async(video_path)
+
+    def open_video_async(self, video_path):
+        """Open the video and decode its first frame without blocking the UI."""
+        self.playing = False
+        self.play_btn.config(text="Play")
+        self.engine.close()
+        self.loading = True
+        self.loader_token += 1
+        self.show_loading_indicator(video_path)
+
+        worker = threading.Thread(target=self.load_video_worker,
+                                  args=(video_path, self.loader_token), daemon=True)
+        worker.start()
+        self.root.after(LOADER_POLL_MS, self.poll_loader, self.loader_token)
+
+    def load_video_worker(self, video_path, token):
+        """Runs on the loader thread; must not touch any Tk widgets."""
+        started = time.perf_counter()
+        try:
+            source = FrameSource(video_path)
+        except Exception as e:  # e.g. cv2.error on a corrupt file
+            print(f"Error while opening {video_path}: {e}")
+            source = None
+        if source is not None and token != self.loader_token:
+            # Superseded while loading; nobody is waiting for this result
+            source.release()
+            return
+        self.loader_queue.put((token, video_path, source, time.perf_counter() - started))
+
+    def release_stale_results(self):
+        """Release queued results of superseded loads once no load is pending."""
+        if self.loading:
+            return  # The current load's poll chain releases them
+        while True:
+            try:
+                _, _, source, _ = self.loader_queue.get_nowait()
+            except queue.Empty:
+                return
+            if source is not None:
+                source.release()
+
+    def poll_loader(self, token):
+        """Poll for the result of load `token`; each load has exactly one poll chain."""
+        if token != self.loader_token or not self.loading:
+            self.release_stale_results()
+            return  # Superseded by a newer load, whose own chain takes over
+
+        while True:
+            try:
+                result_token, video_path, source, load_time = self.loader_queue.get_nowait()
+            except queue.Empty:
+                self.show_loading_indicator(self.loading_path)
+                self.root.after(LOADER_POLL_MS, self.poll_loader, token)
+                return
+            if result_token == token:
+                break
+            if source is not None:
+                source.release()  # Late result of a superseded load
+
+        self.loading = False
+        if source is None or not source.is_open():
+            if source is not None:
+                source.release()
+            self.clear_canvas()
+            self.canvas.create_text(20, 20, anchor=tk.NW, fill="red",
+                                    text=f"Could not open video: {video_path}")
+            print(f"Could not open video: {video_path}")
+            return
+
+        self.engine.set_source(source)
+        self.root.update_idletasks()
+        self.display_frame()
+        print(f"Opened {video_path} in {load_time * 1000:.0f} ms")
+
+    def show_loading_indicator(self, video_path):
+        if not self.loading:
+            return
+        self.loading_path = video_path
+        dots = "." * (int(time.perf_counter() * 4) % 4)
+        self.clear_canvas()
+        self.canvas.create_text(20, 20, anchor=tk.NW,
+                                text=f"Loading {os.path.basename(video_path)}{dots}")
 
     def load_first_frame(self):
-        if self.cap:
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            ret, self.frame = self.cap.read()
-            if ret:
-                self.root.update_idletasks()
-                self.display_frame()
+        if self.engine.seek(0):
+            self.root.update_idletasks()
+            self.display_frame()
 
     def update_loop(self):
-        if self.playing and self.cap and self.cap.isOpened():
-            ret, frame = self.cap.read()
-            if not ret:
-                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                return
-            self.frame = frame
+        if self.playing and self.engine.source:
+            if not self.engine.read_next():
+                # End of the video: rewind and pause
+                self.engine.seek(0)
+                self.playing = False
+                self.play_btn.config(text="Play")
             self.display_frame()
         self.root.after(30, self.update_loop)
 
     def display_frame(self):
-        if self.frame is None:
+        if self.engine.frame is None:
             return
 
-        win_width = self.root.winfo_width()
-        orig_width = self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)
-        orig_height = self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
-
-        self.scale_factor_x = win_width / orig_width
-        scaled_height = int(orig_height * self.scale_factor_x)
-        self.scale_factor_y = scaled_height / orig_height
+        img = Image.fromarray(self.engine.render(self.root.winfo_width()))
+        imgtk = ImageTk.PhotoImage(image=img)
 
-        frame_resized = cv2.resize(self.frame, (win_width, scaled_height))
-        frame_resized = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB)
-        frame_resized = cv2.putText(frame_resized, f"Frame: {self.frame_idx}", (20, 40),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
+        if self.image_item is None:
+            self.image_item = self.canvas.create_image(0, 0, anchor=tk.NW, image=imgtk)
+        else:
+            self.canvas.itemconfigure(self.image_item, image=imgtk)
+        self.canvas.imgtk = imgtk
+        self.redraw_overlay()
 
-        img = Image.fromarray(frame_resized)
-        imgtk = ImageTk.PhotoImage(image=img)
+    def redraw_overlay(self):
+        if self.engine.frame is not None:
+            self.overlay.redraw(self.engine)
 
+    def clear_canvas(self):
         self.canvas.delete("all")
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=imgtk)
-        self.canvas.imgtk = imgtk
+        self.image_item = None
+        self.overlay.reset()
 
     def toggle_play(self):
         self.playing = not self.playing
         self.play_btn.config(text="Pause" if self.playing else "Play")
 
     def stop_video(self):
-        if self.cap:
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            self.load_first_frame()
+        self.load_first_frame()
         self.playing = False
         self.play_btn.config(text="Play")
 
     def advance_frame(self):
-        if not self.cap:
-            return
-        self.frame_idx += self.frame_step
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.frame_idx)
-        ret, self.frame = self.cap.read()
-        if ret:
+        if self.engine.step(self.engine.frame_step):
             self.display_frame()
         
     def toggle_table(self):
@@ -207,53 +418,41 @@ class VideoAnnotator:
         self.display_frame()
 
     def prev_frame(self):
-        if not self.cap:
-            return
-        self.frame_idx = max(0, self.frame_idx - self.frame_step)
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.frame_idx)
-        ret, self.frame = self.cap.read()
-        if ret:
+        if self.engine.step(-self.engine.frame_step):
             self.display_frame()
 
     def overwrite_click_if_exists(self, frame_idx, x_orig, y_orig, label):
-        for i, (video, frame, _, _, _) in enumerate(self.clicks):
-            if frame == frame_idx:
-                self.clicks[i] = (self.video_path, frame_idx, x_orig, y_orig, label)
-                # Update the table too
-                for item in self.table.get_children():
-                    if int(self.table.item(item)['values'][0]) == frame_idx:
-                        self.table.item(item, values=(frame_idx, x_orig, y_orig, label))
-                        return True
-        return False
+        point_id, replaced = self.engine.overwrite_point(x_orig, y_orig, label, frame_idx)
+        if replaced:
+            self.table.item(str(point_id), values=(frame_idx, x_orig, y_orig, label))
+        else:
+            self.insert_table_row(point_id)
+        self.redraw_overlay()
+        return replaced
 
+    def insert_table_row(self, point_id):
+        _, frame_idx, x_orig, y_orig, label = self.engine.store.get(point_id)
+        # Alternate row color by setting the tag
+        row_tag = 'odd' if self.row_count % 2 == 0 else 'even'
+        self.table.insert('', 'end', iid=str(point_id), values=(frame_idx, x_orig, y_orig, label), tags=(row_tag,))
+        self.row_count += 1
 
     def on_left_click(self, event):
-        if self.frame is None or not self.video_path:
+        if self.engine.frame is None:
             return
 
         label = self.label_entry.get()
-        frame_idx = self.frame_idx
-
-        x_orig = int(event.x / self.scale_factor_x)
-        y_orig = int(event.y / self.scale_factor_y)
+        frame_idx = self.engine.frame_idx
+        x_orig, y_orig = self.engine.transform.to_original(event.x, event.y)
 
         # Add the click as a new entry for the frame
-        new_click = (self.video_path, frame_idx, x_orig, y_orig, label)
-        self.clicks.append(new_click)
-
-        # Alternate row color by setting the tag
-        row_tag = 'odd' if self.row_count % 2 == 0 else 'even'
-        self.table.insert('', 'end', values=(frame_idx, x_orig, y_orig, label), tags=(row_tag,))
+        point_id = self.engine.add_point(x_orig, y_orig, label)
+        self.insert_table_row(point_id)
         
-        # Increment row count and annotation count
-        self.row_count += 1
         self.current_annotations += 1
 
         # Provide visual feedback for the click on the canvas
-        self.canvas.create_oval(
-            event.x - 5, event.y - 5, event.x + 5, event.y + 5, 
-            outline="red", width=2
-        )
+        self.redraw_overlay()
 
         print(f"Saved: Frame {frame_idx}, X: {x_orig}, Y: {y_orig}, Label: {label}")
 
@@ -263,16 +462,10 @@ class VideoAnnotator:
             self.advance_frame()
 
     def on_right_click(self, event):
-        selected_item = self.table.selection()
-        if selected_item:
-            self.table.delete(selected_item)
-            if self.clicks:
-                self.clicks.pop()
-        self.frame_idx = max(0, self.frame_idx - self.frame_step)
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.frame_idx)
-        ret, self.frame = self.cap.read()
-        if ret:
-            self.display_frame()
+        for item in self.table.selection():
+            self.engine.delete_point(int(item))
+            self.table.delete(item)
+        self.prev_frame()
 
     def edit_table_entry(self, event):
         selected_item = self.table.focus()
@@ -285,34 +478,68 @@ class VideoAnnotator:
         new_value = simpledialog.askstring("Edit", f"Current value: {old_value}\nEnter new value:")
 
         if new_value is not None:
-            current_values = list(self.table.item(selected_item)['values'])
-            current_values[column_idx] = new_value
-            self.table.item(selected_item, values=current_values)
-
-            idx = self.table.index(selected_item)
-            click = list(self.clicks[idx])
-            click[column_idx + 1] = new_value
-            self.clicks[idx] = tuple(click)
+            field = ("frame", "x", "y", "label")[column_idx]
+            if field != "label":
+                try:
+                    new_value = int(new_value)
+                except ValueError:
+                    print(f"Invalid value for {field}: {new_value}")
+                    return
+
+            _, frame_idx, x_orig, y_orig, label = self.engine.update_point(int(selected_item), **{field: new_value})
+            self.table.item(selected_item, values=(frame_idx, x_orig, y_orig, label))
+            self.redraw_overlay()
 
     def save_clicks(self):
-        output_dir = "./data/"
-        if os.path.isdir(output_dir) == False:
-            os.makedirs(output_dir)
-            print("Created output directory: {}".format(output_dir))
-        timestr = time.strftime("%Y%m%d-%H%M%S")
-        fname = "{}/clicks_{}.csv".format(output_dir,timestr)
-        df = pd.DataFrame(self.clicks, columns=["VideoFile", "Frame", "X", "Y", "Label"])
-        df.to_csv(fname, index=False)
+        fname = self.engine.export("./data/")
         print("Saved clicks to {}".format(fname))
 
     def set_frame_step(self, value):
-        self.frame_step = int(value)
+        self.engine.frame_step = int(value)
+
+    def set_tail_length(self, value):
+        self.overlay.tail_length = int(value)
+        self.redraw_overlay()
+
+def stream_target(value):
+    """argparse type that rejects malformed --stream targets at startup."""
+    try:
+        parse_target(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+def non_negative_int(value):
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must not be negative, got {value}")
+    return number
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Video Annotation Tool")
     parser.add_argument("-v", "--video", type=str, help="Path to video file", default=None)
+    parser.add_argument("-s", "--stream", type=stream_target, default=None,
+                        help="Stream annotation events as JSON lines to stdout ('-'), fifo:PATH, unix:PATH or tcp:HOST:PORT")
+    parser.add_argument("--stream-queue", type=positive_int, default=1000, help="Max number of queued stream events")
+    parser.add_argument("--stream-policy", choices=POLICIES, default="drop",
+                        help="What to do when the stream queue is full: drop new events, or block for up to --stream-block-ms first")
+    parser.add_argument("--stream-block-ms", type=non_negative_int, default=50,
+                        help="How long the block policy waits for queue space before dropping an event")
     args = parser.parse_args()
 
+    streamer = None
+    if args.stream:
+        if args.stream in ("-", "stdout"):
+            sys.stdout = sys.stderr  # Keep status messages out of the event stream
+        streamer = EventStreamer(args.stream, queue_size=args.stream_queue, policy=args.stream_policy,
+                                 block_timeout=args.stream_block_ms / 1000)
+
     root = tk.Tk()
-    app = VideoAnnotator(root, args.video)
+    app = VideoAnnotator(root, args.video, streamer)
     root.mainloop()
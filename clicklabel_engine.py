@@ -0,0 +1,313 @@
+"""UI-independent annotation engine used by clicklabel.py.
+
+Nothing in here depends on Tk, so the engine can be driven from scripts,
+batch jobs and tests without a display:
+
+    engine = AnnotationEngine("video.mp4")
+    engine.step(10)
+    engine.add_point(120, 340, "Male")
+    engine.export("./data/")
+"""
+import os
+import time
+import bisect
+import cv2
+
+COLUMNS = ["VideoFile", "Frame", "X", "Y", "Label"]
+FIELDS = {"video": 0, "frame": 1, "x": 2, "y": 3, "label": 4}
+
+
+class FrameSource:
+    """A seekable video capture that keeps track of the current frame."""
+
+    def __init__(self, video_path):
+        self.video_path = video_path
+        self.cap = cv2.VideoCapture(video_path)
+        self.frame = None
+        self.frame_idx = 0
+        if self.cap.isOpened():
+            self.seek(0)
+
+    def is_open(self):
+        return self.cap is not None and self.cap.isOpened() and self.frame is not None
+
+    @property
+    def width(self):
+        return self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)
+
+    @property
+    def height(self):
+        return self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+
+    @property
+    def frame_count(self):
+        return int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def seek(self, frame_idx):
+        """Decode the frame at frame_idx. Returns False and keeps the current frame if it can't be read."""
+        frame_idx = max(0, int(frame_idx))
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        ret, frame = self.cap.read()
+        if not ret:
+            # Put the capture back behind the current frame so read_next continues from there
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.frame_idx + 1 if self.frame is not None else 0)
+            return False
+        self.frame = frame
+        self.frame_idx = frame_idx
+        return True
+
+    def read_next(self):
+        """Decode the next frame in playback order without seeking."""
+        ret, frame = self.cap.read()
+        if not ret:
+            return False
+        self.frame = frame
+        self.frame_idx += 1
+        return True
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class CoordinateTransform:
+    """Maps between display (canvas) and original video pixel coordinates."""
+
+    def __init__(self, scale_x=1, scale_y=1):
+        self.scale_x = scale_x
+        self.scale_y = scale_y
+
+    @classmethod
+    def fit_width(cls, orig_width, orig_height, display_width):
+        """Transform that scales the video to display_width, keeping the aspect ratio."""
+        scale_x = display_width / orig_width
+        scaled_height = int(orig_height * scale_x)
+        return cls(scale_x, scaled_height / orig_height)
+
+    def to_original(self, x, y):
+        return int(x / self.scale_x), int(y / self.scale_y)
+
+    def to_display(self, x, y):
+        return x * self.scale_x, y * self.scale_y
+
+
+class AnnotationStore:
+    """Point annotations keyed by a stable id, in insertion order.
+
+    Each point is a (VideoFile, Frame, X, Y, Label) tuple. Ids are also indexed
+    per frame, so looking up the points of a frame doesn't scan the whole store.
+
+    Callables in listeners are called as listener(event, point_id, point) after
+    every change, with event one of "add", "overwrite" or "delete".
+    """
+
+    def __init__(self):
+        self.points = {}
+        self.next_id = 0
+        self.by_frame = {}  # frame -> ids in insertion order
+        self.frames = []  # Sorted frames that have at least one point
+        self.listeners = []
+
+    def _index(self, point_id, frame):
+        ids = self.by_frame.get(frame)
+        if ids is None:
+            ids = self.by_frame[frame] = []
+            bisect.insort(self.frames, frame)
+        ids.append(point_id)
+
+    def _unindex(self, point_id, frame):
+        ids = self.by_frame[frame]
+        ids.remove(point_id)
+        if not ids:
+            del self.by_frame[frame]
+            del self.frames[bisect.bisect_left(self.frames, frame)]
+
+    def _notify(self, event, point_id, point):
+        for listener in self.listeners:
+            listener(event, point_id, point)
+
+    def __len__(self):
+        return len(self.points)
+
+    def __iter__(self):
+        return iter(self.points.items())
+
+    def get(self, point_id):
+        return self.points[point_id]
+
+    def rows(self):
+        return list(self.points.values())
+
+    def add(self, video, frame, x, y, label):
+        point_id = self.next_id
+        self.next_id += 1
+        self.points[point_id] = (video, frame, x, y, label)
+        self._index(point_id, frame)
+        self._notify("add", point_id, self.points[point_id])
+        return point_id
+
+    def update(self, point_id, **changes):
+        """Change fields (video, frame, x, y, label) of an existing point."""
+        old_frame = self.points[point_id][1]
+        point = list(self.points[point_id])
+        for field, value in changes.items():
+            point[FIELDS[field]] = value
+        self.points[point_id] = tuple(point)
+        if point[1] != old_frame:
+            self._unindex(point_id, old_frame)
+            self._index(point_id, point[1])
+        self._notify("overwrite", point_id, self.points[point_id])
+        return self.points[point_id]
+
+    def delete(self, point_id):
+        point = self.points.pop(point_id)
+        self._unindex(point_id, point[1])
+        self._notify("delete", point_id, point)
+        return point
+
+    def find_frame(self, frame):
+        """Id of the first point on the given frame, or None."""
+        ids = self.by_frame.get(frame)
+        return ids[0] if ids else None
+
+    def on_frame(self, frame):
+        """(id, point) pairs annotated on the given frame."""
+        return [(point_id, self.points[point_id]) for point_id in self.by_frame.get(frame, ())]
+
+    def frames_between(self, start, end):
+        """Annotated frames in [start, end), nearest to end first."""
+        lo = bisect.bisect_left(self.frames, start)
+        hi = bisect.bisect_left(self.frames, end)
+        return self.frames[lo:hi][::-1]
+
+    def overwrite(self, video, frame, x, y, label):
+        """Replace the first point on frame, or add one. Returns (point_id, replaced)."""
+        point_id = self.find_frame(frame)
+        if point_id is None:
+            return self.add(video, frame, x, y, label), False
+        self.points[point_id] = (video, frame, x, y, label)
+        self._notify("overwrite", point_id, self.points[point_id])
+        return point_id, True
+
+    def export_csv(self, fname):
+        import pandas as pd  # Only needed for export, keep startup fast
+        df = pd.DataFrame(self.rows(), columns=COLUMNS)
+        df.to_csv(fname, index=False)
+
+    def load_csv(self, fname):
+        """Append the points of a previously exported CSV. Returns the new ids."""
+        import pandas as pd
+        df = pd.read_csv(fname, keep_default_na=False)
+        return [self.add(video, int(frame), int(x), int(y), label)
+                for video, frame, x, y, label in df[COLUMNS].itertuples(index=False)]
+
+
+class AnnotationEngine:
+    """Frame navigation, coordinate mapping and annotation storage for one video."""
+
+    def __init__(self, video_path=None):
+        self.source = None
+        self.store = AnnotationStore()
+        self.transform = CoordinateTransform()
+        self.frame_step = 1
+        if video_path:
+            self.open(video_path)
+
+    @property
+    def video_path(self):
+        return self.source.video_path if self.source else None
+
+    @property
+    def frame(self):
+        return self.source.frame if self.source else None
+
+    @property
+    def frame_idx(self):
+        return self.source.frame_idx if self.source else 0
+
+    def open(self, video_path):
+        """Open video_path and decode its first frame. Returns False if it can't be read."""
+        source = FrameSource(video_path)
+        if not source.is_open():
+            source.release()
+            return False
+        self.set_source(source)
+        return True
+
+    def set_source(self, source):
+        """Switch to an already opened FrameSource, e.g. one opened on another thread."""
+        self.close()
+        self.source = source
+
+    def close(self):
+        if self.source:
+            self.source.release()
+        self.source = None
+
+    def seek(self, frame_idx):
+        return self.source is not None and self.source.seek(frame_idx)
+
+    def step(self, n=None):
+        """Move n frames (default: frame_step); negative values step backwards."""
+        if self.source is None:
+            return False
+        if n is None:
+            n = self.frame_step
+        return self.source.seek(max(0, self.frame_idx + n))
+
+    def read_next(self):
+        return self.source is not None and self.source.read_next()
+
+    def render(self, display_width):
+        """Scale the current frame to display_width and return it as an RGB array."""
+        self.transform = CoordinateTransform.fit_width(self.source.width, self.source.height, display_width)
+        scaled_height = int(self.source.height * self.transform.scale_x)
+
+        frame_resized = cv2.resize(self.frame, (display_width, scaled_height))
+        frame_resized = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB)
+        return cv2.putText(frame_resized, f"Frame: {self.frame_idx}", (20, 40),
+                           cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
+
+    def add_point(self, x, y, label, frame_idx=None):
+        """Add a point in original video coordinates to frame_idx (default: current frame)."""
+        frame_idx = self.frame_idx if frame_idx is None else frame_idx
+        return self.store.add(self.video_path, frame_idx, x, y, label)
+
+    def overwrite_point(self, x, y, label, frame_idx=None):
+        frame_idx = self.frame_idx if frame_idx is None else frame_idx
+        return self.store.overwrite(self.video_path, frame_idx, x, y, label)
+
+    def update_point(self, point_id, **changes):
+        return self.store.update(point_id, **changes)
+
+    def delete_point(self, point_id):
+        return self.store.delete(point_id)
+
+    def annotations_near(self, tail_length=0, frame_idx=None):
+        """Points of the current frame and the tails leading up to it.
+
+        Returns (current, tails): current is a list of (id, point) on frame_idx,
+        tails maps each label to (age, x, y) tuples for the points at most
+        tail_length frame steps before frame_idx, oldest first. The age is the
+        distance to frame_idx in frame steps, so 1 is the previous step.
+        """
+        frame_idx = self.frame_idx if frame_idx is None else frame_idx
+        step = max(1, abs(self.frame_step))
+        current = self.store.on_frame(frame_idx)
+        tails = {}
+        for frame in self.store.frames_between(frame_idx - tail_length * step, frame_idx):
+            age = (frame_idx - frame) / step
+            for _, (_, _, x, y, label) in self.store.on_frame(frame):
+                tails.setdefault(label, []).append((age, x, y))
+        for points in tails.values():
+            points.reverse()
+        return current, tails
+
+    def export(self, output_dir="./data/"):
+        """Write all points to a timestamped CSV in output_dir and return its path."""
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+        timestr = time.strftime("%Y%m%d-%H%M%S")
+        fname = os.path.join(output_dir, "clicks_{}.csv".format(timestr))
+        self.store.export_csv(fname)
+        return fname
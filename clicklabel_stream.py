@@ -0,0 +1,172 @@
+"""Live streaming of annotation events to local consumers.
+
+Every add, overwrite and delete in an AnnotationStore is sent as one JSON line
+to stdout, a named pipe or a local UNIX/TCP socket:
+
+    streamer = EventStreamer("tcp:127.0.0.1:5555")
+    engine.store.listeners.append(streamer.on_annotation)
+
+Events are queued and written by a background thread, so a slow or missing
+consumer never blocks the caller. When the queue is full, events are either
+dropped right away ("drop") or after waiting at most block_timeout seconds for
+space ("block"). The number of dropped events is reported on close.
+
+Events dropped because the queue was full are counted separately from events
+the sender thread had to discard because the target couldn't be opened or
+written to; each counter is only written by one thread.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import threading
+
+POLICIES = ("drop", "block")
+RECONNECT_DELAY = 1.0  # Seconds to wait before reopening a sink that failed
+
+
+def parse_target(target):
+    """Split a stream target into (kind, address), raising ValueError if it is malformed.
+
+    target is "-" or "stdout", "fifo:/path/to/pipe", "unix:/path/to/socket"
+    or "tcp:host:port".
+    """
+    if target in ("-", "stdout"):
+        return "stdout", None
+    kind, _, address = target.partition(":")
+    if kind in ("fifo", "unix"):
+        if not address:
+            raise ValueError(f"Missing path in stream target: {target}")
+        return kind, address
+    if kind == "tcp":
+        host, _, port = address.rpartition(":")
+        if not port.isdigit() or not 0 < int(port) < 65536:
+            raise ValueError(f"Expected tcp:HOST:PORT, got: {target}")
+        return kind, (host or "127.0.0.1", int(port))
+    raise ValueError(f"Unknown stream target {target!r}, expected -, fifo:PATH, unix:PATH or tcp:HOST:PORT")
+
+
+def open_sink(target):
+    """Open target and return a file-like object with write() and flush().
+
+    Opening a named pipe blocks until a reader connects.
+    """
+    kind, address = parse_target(target)
+    if kind == "stdout":
+        return sys.__stdout__
+    if kind == "fifo":
+        if not os.path.exists(address):
+            os.mkfifo(address)
+        return open(address, "w", buffering=1)
+    if kind == "unix":
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address)
+        sink = sock.makefile("w", buffering=1)
+        sock.close()  # The socket stays open until the file object is closed
+        return sink
+    if kind == "tcp":
+        sock = socket.create_connection(address)
+        sink = sock.makefile("w", buffering=1)
+        sock.close()  # The socket stays open until the file object is closed
+        return sink
+
+
+class EventStreamer:
+    """Sends annotation events as JSON lines from a background thread."""
+
+    def __init__(self, target, queue_size=1000, policy="drop", block_timeout=0.05):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}, not {policy!r}")
+        if queue_size < 1:
+            raise ValueError(f"queue_size must be at least 1, not {queue_size}")  # 0 would mean unbounded
+        if block_timeout < 0:
+            raise ValueError(f"block_timeout must not be negative, not {block_timeout}")
+        parse_target(target)  # Fail now rather than on the first event
+        self.target = target
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.queue_full_drops = 0  # Written by the caller's thread only
+        self.sink_drops = 0  # Written by the sender thread only
+        self.sent = 0
+        self.closing = False
+        self.sink = None
+        self.thread = threading.Thread(target=self.run, name="clicklabel-stream", daemon=True)
+        self.thread.start()
+
+    @property
+    def dropped(self):
+        return self.queue_full_drops + self.sink_drops
+
+    def on_annotation(self, event, point_id, point):
+        """AnnotationStore listener. Never raises, so streaming can't break the store."""
+        try:
+            video, frame, x, y, label = point
+            self.send({"event": event, "id": point_id, "video": video, "frame": frame,
+                       "x": x, "y": y, "label": label, "time": time.time()})
+        except Exception as e:
+            print(f"Could not stream {event} event for point {point_id}: {e}", file=sys.stderr)
+
+    def send(self, message):
+        """Queue a message without blocking longer than the policy allows."""
+        try:
+            if self.policy == "block":
+                self.queue.put(message, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(message)
+        except queue.Full:
+            if not self.queue_full_drops:
+                print(f"Stream to {self.target} can't keep up, dropping events", file=sys.stderr)
+            self.queue_full_drops += 1
+
+    def run(self):
+        retry_at = 0
+        while True:
+            message = self.queue.get()
+            if message is None:
+                break
+            if self.sink is None:
+                if time.monotonic() < retry_at:
+                    self.sink_drops += 1
+                    continue
+                try:
+                    self.sink = open_sink(self.target)
+                except (OSError, ValueError) as e:
+                    print(f"Could not open stream target {self.target}: {e}", file=sys.stderr)
+                    retry_at = time.monotonic() + RECONNECT_DELAY
+                    self.sink_drops += 1
+                    continue
+            try:
+                self.sink.write(json.dumps(message, default=str) + "\n")
+                self.sink.flush()
+                self.sent += 1
+            except OSError as e:
+                print(f"Stream to {self.target} failed: {e}", file=sys.stderr)
+                self.close_sink()
+                retry_at = time.monotonic() + RECONNECT_DELAY
+                self.sink_drops += 1
+        self.close_sink()
+
+    def close_sink(self):
+        if self.sink is not None and self.sink is not sys.__stdout__:
+            try:
+                self.sink.close()
+            except OSError:
+                pass
+        self.sink = None
+
+    def close(self, timeout=1.0):
+        """Flush queued events for at most timeout seconds and stop the sender."""
+        if self.closing:
+            return
+        self.closing = True
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return  # Sender is stuck on the consumer; it is a daemon thread and dies with the process
+        self.thread.join(timeout)
+        if self.dropped:
+            print(f"Stream to {self.target}: {self.sent} events sent, {self.queue_full_drops} dropped on a full queue, "
+                  f"{self.sink_drops} dropped while the target was unavailable", file=sys.stderr)
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clicklabel_engine import AnnotationEngine  # noqa: E402
+
+N_FRAMES = 10
+
+
+@pytest.fixture
+def video(tmp_path):
+    """A small MJPG video whose frames encode their index in the pixel values."""
+    path = str(tmp_path / "video.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    for i in range(N_FRAMES):
+        writer.write(np.full((48, 64, 3), i * 20, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def engine(video):
+    engine = AnnotationEngine(video)
+    yield engine
+    engine.close()
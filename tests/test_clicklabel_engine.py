@@ -0,0 +1,91 @@
+from clicklabel_engine import AnnotationEngine
+
+
+def frame_value(engine):
+    return round(engine.frame.mean() / 20)
+
+
+def test_open_and_step(engine):
+    assert engine.frame_idx == 0
+    assert engine.step(3)
+    assert engine.frame_idx == 3
+    assert frame_value(engine) == 3
+    assert engine.step(-2)
+    assert engine.frame_idx == 1
+
+
+def test_step_past_last_frame(engine):
+    assert engine.seek(7)
+    assert not engine.step(5)
+    assert engine.frame_idx == 7
+    assert frame_value(engine) == 7
+
+    # Playback continues from the current frame after the failed step
+    assert engine.read_next()
+    assert engine.frame_idx == 8
+    assert frame_value(engine) == 8
+
+
+def test_add_overwrite_update(engine):
+    first = engine.add_point(10, 20, "Male", frame_idx=2)
+    second = engine.add_point(30, 40, "Female", frame_idx=2)
+    assert [point_id for point_id, _ in engine.store.on_frame(2)] == [first, second]
+
+    point_id, replaced = engine.overwrite_point(11, 21, "Male", frame_idx=2)
+    assert (point_id, replaced) == (first, True)
+    assert engine.store.get(first)[2:] == (11, 21, "Male")
+
+    point_id, replaced = engine.overwrite_point(5, 5, "Male", frame_idx=4)
+    assert not replaced
+    assert engine.store.frames == [2, 4]
+
+    # Moving a point to another frame re-indexes it
+    engine.update_point(second, frame=6, label="Juvenile")
+    assert [point_id for point_id, _ in engine.store.on_frame(2)] == [first]
+    assert engine.store.on_frame(6) == [(second, (engine.video_path, 6, 30, 40, "Juvenile"))]
+    assert engine.store.frames == [2, 4, 6]
+
+
+def test_delete(engine):
+    point_id = engine.add_point(10, 20, "Male", frame_idx=3)
+    other = engine.add_point(30, 40, "Male", frame_idx=5)
+    assert engine.delete_point(point_id) == (engine.video_path, 3, 10, 20, "Male")
+    assert engine.store.on_frame(3) == []
+    assert engine.store.frames == [5]
+    assert [point_id for point_id, _ in engine.store] == [other]
+
+
+def test_listeners(engine):
+    events = []
+    engine.store.listeners.append(lambda event, point_id, point: events.append((event, point_id)))
+    point_id = engine.add_point(1, 2, "Male")
+    engine.update_point(point_id, x=3)
+    engine.delete_point(point_id)
+    assert events == [("add", point_id), ("overwrite", point_id), ("delete", point_id)]
+
+
+def test_export_load_round_trip(engine, tmp_path):
+    engine.add_point(10, 20, "Male", frame_idx=0)
+    engine.add_point(30, 40, "Female", frame_idx=4)
+    fname = engine.export(str(tmp_path / "data"))
+
+    loaded = AnnotationEngine()
+    loaded.store.load_csv(fname)
+    assert loaded.store.rows() == engine.store.rows()
+    assert loaded.store.frames == [0, 4]
+
+
+def test_annotations_near_limits_tail_by_frame_distance(engine):
+    engine.frame_step = 2
+    engine.add_point(1, 1, "Male", frame_idx=0)
+    engine.add_point(2, 2, "Male", frame_idx=4)
+    engine.add_point(3, 3, "Male", frame_idx=6)
+    engine.add_point(4, 4, "Female", frame_idx=6)
+    current_id = engine.add_point(5, 5, "Male", frame_idx=8)
+
+    current, tails = engine.annotations_near(tail_length=2, frame_idx=8)
+    assert [point_id for point_id, _ in current] == [current_id]
+    # Two steps of 2 frames reach back to frame 4; frame 0 is out of range
+    assert tails == {"Male": [(2.0, 2, 2), (1.0, 3, 3)], "Female": [(1.0, 4, 4)]}
+
+    assert engine.annotations_near(tail_length=0, frame_idx=8)[1] == {}
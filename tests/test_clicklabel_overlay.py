@@ -0,0 +1,87 @@
+from clicklabel import fade, overlay_specs
+
+RED = "#ff0000"
+TAIL = 4
+
+
+def specs(engine, frame_idx=5):
+    """overlay_specs at frame_idx with an identity display transform and one color."""
+    assert engine.seek(frame_idx)
+    return overlay_specs(engine, TAIL, lambda label: RED)
+
+
+def line_coords(line_specs):
+    return [coords for coords, _ in line_specs]
+
+
+def test_fade():
+    assert fade(RED, 0) == RED
+    assert fade(RED, 0.5) == "#bf4040"
+    assert fade(RED, 1) == "#808080"
+
+
+def test_single_points_per_frame_are_joined(engine):
+    engine.add_point(10, 10, "Male", frame_idx=3)
+    engine.add_point(20, 20, "Male", frame_idx=4)
+    engine.add_point(30, 30, "Male", frame_idx=5)
+
+    lines, dots, points = specs(engine)
+    assert line_coords(lines) == [(10, 10, 20, 20), (20, 20, 30, 30)]
+    assert len(dots) == 2
+    assert points == [((25, 25, 35, 35), {"outline": RED, "width": 2})]
+
+
+def test_tail_without_current_point_has_no_connector(engine):
+    engine.add_point(10, 10, "Male", frame_idx=3)
+    engine.add_point(20, 20, "Male", frame_idx=4)
+
+    lines, dots, points = specs(engine)
+    assert line_coords(lines) == [(10, 10, 20, 20)]
+    assert len(dots) == 2
+    assert points == []
+
+
+def test_several_points_on_a_tail_frame_draw_dots_only(engine):
+    engine.add_point(10, 10, "Male", frame_idx=3)
+    engine.add_point(20, 20, "Male", frame_idx=4)
+    engine.add_point(40, 40, "Male", frame_idx=4)
+    engine.add_point(30, 30, "Male", frame_idx=5)
+
+    lines, dots, points = specs(engine)
+    assert lines == []
+    assert len(dots) == 3
+    assert len(points) == 1
+
+
+def test_several_current_points_draw_dots_only(engine):
+    engine.add_point(10, 10, "Male", frame_idx=4)
+    engine.add_point(30, 30, "Male", frame_idx=5)
+    engine.add_point(40, 40, "Male", frame_idx=5)
+
+    lines, dots, points = specs(engine)
+    assert lines == []
+    assert len(dots) == 1
+    assert len(points) == 2
+
+
+def test_join_is_decided_per_label(engine):
+    engine.add_point(10, 10, "Male", frame_idx=4)
+    engine.add_point(30, 30, "Male", frame_idx=5)
+    engine.add_point(11, 11, "Female", frame_idx=4)
+    engine.add_point(12, 12, "Female", frame_idx=4)
+
+    lines, dots, _ = specs(engine)
+    assert line_coords(lines) == [(10, 10, 30, 30)]
+    assert len(dots) == 3
+
+
+def test_tail_colors_fade_with_age(engine):
+    engine.add_point(10, 10, "Male", frame_idx=2)  # Age 3
+    engine.add_point(20, 20, "Male", frame_idx=4)  # Age 1
+    engine.add_point(30, 30, "Male", frame_idx=5)
+
+    lines, dots, _ = specs(engine)
+    assert [options["fill"] for _, options in dots] == [fade(RED, 3 / (TAIL + 1)), fade(RED, 1 / (TAIL + 1))]
+    assert [options["outline"] for _, options in dots] == [options["fill"] for _, options in dots]
+    # Each segment takes the color of its newer tail point, the connector is nearly unfaded
+    assert [options["fill"] for _, options in lines] == [fade(RED, 1 / (TAIL + 1)), fade(RED, 0.5 / (TAIL + 1))]
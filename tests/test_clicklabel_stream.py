@@ -0,0 +1,116 @@
+import os
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from clicklabel_engine import AnnotationStore
+from clicklabel_stream import EventStreamer, parse_target
+
+
+def test_parse_target():
+    assert parse_target("-") == ("stdout", None)
+    assert parse_target("fifo:/tmp/events") == ("fifo", "/tmp/events")
+    assert parse_target("unix:/tmp/events.sock") == ("unix", "/tmp/events.sock")
+    assert parse_target("tcp:localhost:5555") == ("tcp", ("localhost", 5555))
+    assert parse_target("tcp::5555") == ("tcp", ("127.0.0.1", 5555))
+
+
+@pytest.mark.parametrize("target", ["tpc:127.0.0.1:5555", "tcp:localhost", "tcp:localhost:0", "fifo:", "events.jsonl"])
+def test_invalid_target_fails_at_construction(target):
+    with pytest.raises(ValueError):
+        EventStreamer(target)
+
+
+def test_events_streamed_over_tcp():
+    server = socket.create_server(("127.0.0.1", 0))
+    port = server.getsockname()[1]
+    lines = []
+
+    def accept():
+        conn, _ = server.accept()
+        with conn, conn.makefile() as f:
+            lines.extend(f)
+
+    reader = threading.Thread(target=accept)
+    reader.start()
+
+    store = AnnotationStore()
+    streamer = EventStreamer(f"tcp:127.0.0.1:{port}")
+    store.listeners.append(streamer.on_annotation)
+    point_id = store.add("video.mp4", 3, 10, 20, "Male")
+    store.update(point_id, label="Female")
+    store.delete(point_id)
+    streamer.close()
+    reader.join(timeout=5)
+    server.close()
+
+    events = [json.loads(line) for line in lines]
+    assert [e["event"] for e in events] == ["add", "overwrite", "delete"]
+    assert events[1]["label"] == "Female"
+    assert events[0]["frame"] == 3 and events[0]["x"] == 10 and events[0]["y"] == 20
+
+
+@pytest.fixture
+def stalled_fifo(tmp_path):
+    """A named pipe nobody reads: the sender thread blocks opening it, so the queue fills up."""
+    path = str(tmp_path / "events")
+    os.mkfifo(path)
+    yield path
+    # Connect a reader so the blocked sender thread can finish
+    fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+    time.sleep(0.05)
+    os.close(fd)
+
+
+@pytest.mark.parametrize("policy, block_timeout", [("drop", 0), ("block", 0.02)])
+def test_full_queue_drops_without_blocking_longer_than_timeout(stalled_fifo, policy, block_timeout, capsys):
+    streamer = EventStreamer(f"fifo:{stalled_fifo}", queue_size=2, policy=policy, block_timeout=block_timeout)
+    streamer.send({"i": 0})
+    time.sleep(0.1)  # Let the sender take the first event and block on the pipe
+
+    n = 20
+    started = time.perf_counter()
+    for i in range(1, n):
+        streamer.send({"i": i})
+    elapsed = time.perf_counter() - started
+
+    assert streamer.queue.full()
+    assert streamer.queue_full_drops == n - 3  # One event held by the sender, two queued
+    assert streamer.sink_drops == 0
+    assert elapsed >= 0.9 * streamer.queue_full_drops * block_timeout
+    assert elapsed < streamer.queue_full_drops * block_timeout + 0.5
+    assert "can't keep up" in capsys.readouterr().err
+
+
+def test_queue_full_warning_after_sink_drops(stalled_fifo, capsys):
+    streamer = EventStreamer(f"fifo:{stalled_fifo}", queue_size=1)
+    streamer.sink_drops = 5  # As if the target had been down before
+    streamer.send({"i": 0})
+    time.sleep(0.1)
+    streamer.send({"i": 1})
+    streamer.send({"i": 2})
+    assert streamer.queue_full_drops == 1
+    assert "can't keep up" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("kwargs", [{"queue_size": 0}, {"queue_size": -1}, {"block_timeout": -0.001}])
+def test_invalid_queue_settings(kwargs):
+    with pytest.raises(ValueError):
+        EventStreamer("-", **kwargs)
+
+
+def test_listener_errors_do_not_reach_the_store(capsys):
+    streamer = EventStreamer("tcp:127.0.0.1:9")
+
+    def fail(message):
+        raise RuntimeError("boom")
+
+    streamer.send = fail
+    store = AnnotationStore()
+    store.listeners.append(streamer.on_annotation)
+    point_id = store.add("video.mp4", 1, 2, 3, "Male")
+    assert store.get(point_id) == ("video.mp4", 1, 2, 3, "Male")
+    assert "boom" in capsys.readouterr().err